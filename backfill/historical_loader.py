@@ -8,7 +8,10 @@ from __future__ import annotations
 
 import logging
 import os
+import sys
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from typing import Iterator
 
 import pandas as pd
 import yfinance as yf
@@ -17,7 +20,16 @@ from sqlalchemy import create_engine, text
 from sqlalchemy.engine import Engine
 from tqdm import tqdm
 
-from schema import ensure_schema
+from bulk_load import copy_dataframe, tune_sqlite_engine
+from features import with_derived_columns
+from schema import (
+    SOURCE_COLUMNS,
+    apply_schema,
+    drop_secondary_indexes,
+    ensure_schema,
+    refresh_ticker_last_dates,
+)
+from yf_cache import configure_yfinance_cache
 
 logging.basicConfig(
     level=os.getenv("LOG_LEVEL", "INFO").upper(),
@@ -37,6 +49,10 @@ TICKERS = [ticker.strip().upper() for ticker in os.getenv("TICKERS", "").split("
 if not TICKERS:
     raise RuntimeError("TICKERS environment variable must contain at least one symbol.")
 START_DATE = os.getenv("BACKFILL_START", "2020-01-01")
+# Below this many tickers, preparing frames in-process beats paying for worker
+# start-up and pickling each frame across the process boundary.
+PARALLEL_PREP_MIN_TICKERS = int(os.getenv("BACKFILL_PARALLEL_MIN_TICKERS", "50"))
+configure_yfinance_cache()
 
 _ENGINE: Engine | None = None
 
@@ -45,67 +61,91 @@ def get_engine() -> Engine:
     """Create and cache the SQLAlchemy engine for PostgreSQL."""
     global _ENGINE
     if _ENGINE is None:
-        _ENGINE = create_engine(DATABASE_URL, future=True)
+        _ENGINE = tune_sqlite_engine(create_engine(DATABASE_URL, future=True))
     return _ENGINE
 
 
+def prepare_ticker_frame(ticker: str, df: pd.DataFrame) -> pd.DataFrame:
+    """Flatten one ticker's download into the stocks_data column layout with derived metrics."""
+    df = df.reset_index()
+    df.columns = df.columns.astype(str).str.strip().str.lower()
+    cols = [c for c in SOURCE_COLUMNS if c in df.columns]
+    return with_derived_columns(df[cols], ticker)
+
+
+def iter_prepared_frames(downloads: dict[str, pd.DataFrame]) -> Iterator[pd.DataFrame]:
+    """Yield ``prepare_ticker_frame`` results in ``downloads`` order.
+
+    Large ticker sets are spread across a process pool since the per-ticker work is
+    CPU-bound and independent; small ones are prepared serially.
+    """
+    if len(downloads) < PARALLEL_PREP_MIN_TICKERS:
+        yield from map(prepare_ticker_frame, downloads.keys(), downloads.values())
+        return
+
+    with ProcessPoolExecutor(max_workers=min(os.cpu_count() or 1, len(downloads))) as executor:
+        yield from executor.map(prepare_ticker_frame, downloads.keys(), downloads.values())
+
+
 def backfill():
     """Download full historical data and write to database."""
     engine = get_engine()
     ensure_schema(engine)
-    all_data = []
 
-    logger.info("Starting historical backfill")
+    end_date = datetime.today().strftime("%Y-%m-%d")
+    logger.info("Starting historical backfill from %s to %s", START_DATE, end_date)
+
+    # One batched request lets yfinance download every ticker concurrently.
+    raw = yf.download(
+        TICKERS,
+        start=START_DATE,
+        end=end_date,
+        group_by="ticker",
+        threads=True,
+        progress=False,
+        auto_adjust=True,
+    )
 
-    for ticker in tqdm(TICKERS, desc="Downloading stocks"):
-        df = yf.download(
-            ticker,
-            start=START_DATE,
-            end=datetime.today().strftime("%Y-%m-%d"),
-            progress=False,
-            auto_adjust=True,
-        )
+    downloads: dict[str, pd.DataFrame] = {}
+    for ticker in TICKERS:
+        if raw.empty or ticker not in raw.columns.get_level_values(0):
+            logger.warning("Skipped %s — no data returned", ticker)
+            continue
 
+        df = raw[ticker].dropna(how="all")
         if df.empty:
             logger.warning("Skipped %s — no data returned", ticker)
             continue
 
-        df.columns = [str(col[0]) if isinstance(col, tuple) else str(col) for col in df.columns]
-        cols = [c for c in ["open", "high", "low", "close", "volume"] if c in df.columns]
-        df = df[cols].copy()
-
-        df.reset_index(inplace=True)
-        df["ticker"] = ticker
-        df["return_pct"] = (df["close"] - df["open"]) / df["open"] * 100
-        df["ma7"] = df["close"].rolling(7).mean()
-        df["volatility"] = df["close"].rolling(7).std()
-
-        all_data.append(df)
+        downloads[ticker] = df
 
-    if all_data:
-        combined = pd.concat(all_data, ignore_index=True)
-        combined.columns = [c.replace(" ", "_") for c in combined.columns]
+    if not downloads:
+        logger.warning("No data downloaded during backfill")
+        return
+
+    # Replace the table contents in one transaction: empty it, load without the
+    # secondary indexes and rebuild them once the data is in place.
+    inserted = 0
+    with engine.begin() as conn:
+        if conn.dialect.name == "postgresql":
+            conn.execute(text("TRUNCATE stocks_data"))
+        else:
+            conn.execute(text("DELETE FROM stocks_data"))
+        drop_secondary_indexes(conn)
 
-        combined["return_pct"] = (combined["close"] - combined["open"]) / combined["open"] * 100
-        combined["ma7"] = combined.groupby("ticker")["close"].transform(lambda s: s.rolling(7, min_periods=1).mean())
-        combined["volatility"] = combined.groupby("ticker")["close"].transform(
-            lambda s: s.rolling(7, min_periods=2).std()
-        )
+        # Each prepared frame is copied in as soon as it arrives rather than being
+        # held for one large concat.
+        frames = iter_prepared_frames(downloads)
+        if sys.stderr.isatty():
+            frames = tqdm(frames, total=len(downloads), desc="Processing stocks", mininterval=2.0)
+        for df in frames:
+            copy_dataframe(df, "stocks_data", conn)
+            inserted += len(df.index)
 
-        with engine.begin() as conn:
-            conn.execute(text("DELETE FROM stocks_data"))
+        apply_schema(conn)
+        refresh_ticker_last_dates(conn)
 
-        combined.to_sql(
-            "stocks_data",
-            con=engine,
-            if_exists="append",
-            index=False,
-            method="multi",
-            chunksize=1000,
-        )
-        logger.info("Historical backfill complete: inserted %d rows", len(combined.index))
-    else:
-        logger.warning("No data downloaded during backfill")
+    logger.info("Historical backfill complete: inserted %d rows", inserted)
 
 
 if __name__ == "__main__":
@@ -0,0 +1,151 @@
+"""Bulk insert helpers for the stock data pipeline."""
+
+from __future__ import annotations
+
+import csv
+import io
+from typing import Any, Iterable
+
+import pandas as pd
+import pyarrow as pa
+import pyarrow.csv as pa_csv
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.engine import Connection, Engine
+
+# Write-path settings for SQLite: WAL journaling with NORMAL sync avoids an fsync
+# per commit, and temp tables/indexes stay in memory with a 256 MiB page cache.
+SQLITE_PRAGMAS = (
+    "journal_mode=WAL",
+    "synchronous=NORMAL",
+    "temp_store=MEMORY",
+    "cache_size=-262144",
+)
+
+
+def tune_sqlite_engine(engine: Engine) -> Engine:
+    """Apply ``SQLITE_PRAGMAS`` to every new connection of a SQLite engine.
+
+    Engines for other dialects are returned unchanged.
+    """
+    if engine.dialect.name != "sqlite":
+        return engine
+
+    @event.listens_for(engine, "connect")
+    def _set_pragmas(dbapi_connection, _connection_record):
+        cursor = dbapi_connection.cursor()
+        try:
+            for pragma in SQLITE_PRAGMAS:
+                cursor.execute(f"PRAGMA {pragma}")
+        finally:
+            cursor.close()
+
+    return engine
+
+
+def _quote(identifier: str) -> str:
+    return '"' + identifier.replace('"', '""') + '"'
+
+
+def psql_insert_copy(table: Any, conn: Connection, keys: list[str], data_iter: Iterable[tuple]) -> int:
+    """``DataFrame.to_sql`` insertion method that streams rows through ``COPY``.
+
+    PostgreSQL connections load the rows with ``COPY ... FROM STDIN`` which is far
+    cheaper than multi-row ``INSERT`` statements. Other dialects (SQLite in the
+    tests) fall back to a plain executemany insert.
+    """
+    if conn.dialect.name != "postgresql":
+        rows = [dict(zip(keys, row)) for row in data_iter]
+        if not rows:
+            return 0
+        return conn.execute(table.table.insert(), rows).rowcount
+
+    buffer = io.StringIO()
+    csv.writer(buffer).writerows(data_iter)
+    buffer.seek(0)
+
+    target = _quote(table.name)
+    if table.schema:
+        target = f"{_quote(table.schema)}.{target}"
+    columns = ", ".join(_quote(key) for key in keys)
+
+    with conn.connection.cursor() as cur:
+        cur.copy_expert(f"COPY {target} ({columns}) FROM STDIN WITH CSV", buffer)
+        return cur.rowcount
+
+
+def insert_ignore_duplicates(table: Any, conn: Connection, keys: list[str], data_iter: Iterable[tuple]) -> int:
+    """``DataFrame.to_sql`` insertion method that skips rows already in the table.
+
+    Emits ``INSERT ... ON CONFLICT DO NOTHING`` so the database enforces the
+    ``(ticker, date)`` key instead of the caller reading existing keys back to
+    filter them out. The rows go out as one executemany: psycopg2 pages it into
+    multi-row VALUES statements, SQLite runs single-row inserts.
+    """
+    rows = [dict(zip(keys, row)) for row in data_iter]
+    if not rows:
+        return 0
+
+    if conn.dialect.name == "postgresql":
+        stmt = postgresql.insert(table.table).on_conflict_do_nothing()
+    elif conn.dialect.name == "sqlite":
+        stmt = sqlite.insert(table.table).on_conflict_do_nothing()
+    else:
+        raise RuntimeError(f"ON CONFLICT inserts are not supported for {conn.dialect.name!r}")
+    return conn.execute(stmt, rows).rowcount
+
+
+def dataframe_to_csv_buffer(df: pd.DataFrame) -> io.BytesIO:
+    """Serialise ``df`` as header-less CSV for ``COPY ... WITH CSV``.
+
+    Uses pyarrow's multi-threaded C++ CSV writer instead of formatting each cell
+    in Python. Missing values are written as empty fields, which COPY reads as NULL.
+    A float ``volume`` column (NaN-padded multi-ticker downloads) is written as
+    nullable integers so BIGINT accepts it, rather than as ``1.5e+10`` or ``150.0``.
+    """
+    if "volume" in df.columns and pd.api.types.is_float_dtype(df["volume"]):
+        df = df.assign(volume=df["volume"].round().astype("Int64"))
+
+    buffer = io.BytesIO()
+    pa_csv.write_csv(
+        pa.Table.from_pandas(df, preserve_index=False),
+        buffer,
+        write_options=pa_csv.WriteOptions(include_header=False),
+    )
+    buffer.seek(0)
+    return buffer
+
+
+def copy_dataframe(df: pd.DataFrame, table: str, conn: Connection) -> int:
+    """Append ``df`` to an existing ``table`` through ``COPY``; return the row count.
+
+    Non-PostgreSQL connections fall back to ``DataFrame.to_sql``.
+    """
+    if conn.dialect.name != "postgresql":
+        return df.to_sql(table, con=conn, if_exists="append", index=False, method=psql_insert_copy) or 0
+
+    buffer = dataframe_to_csv_buffer(df)
+    columns = ", ".join(_quote(str(col)) for col in df.columns)
+    with conn.connection.cursor() as cur:
+        cur.copy_expert(f"COPY {_quote(table)} ({columns}) FROM STDIN WITH CSV", buffer)
+        return cur.rowcount
+
+
+def copy_dataframe_ignore_duplicates(df: pd.DataFrame, table: str, conn: Connection) -> int:
+    """Append ``df`` to ``table`` through ``COPY`` and a staging table, skipping existing keys."""
+    if conn.dialect.name != "postgresql":
+        return df.to_sql(table, con=conn, if_exists="append", index=False, method=insert_ignore_duplicates) or 0
+
+    staging = f"{table}_staging"
+    conn.exec_driver_sql(
+        f"CREATE TEMP TABLE IF NOT EXISTS {_quote(staging)} "
+        f"(LIKE {_quote(table)} INCLUDING DEFAULTS) ON COMMIT DROP"
+    )
+    conn.exec_driver_sql(f"TRUNCATE {_quote(staging)}")
+    copy_dataframe(df, staging, conn)
+
+    columns = ", ".join(_quote(str(col)) for col in df.columns)
+    result = conn.exec_driver_sql(
+        f"INSERT INTO {_quote(table)} ({columns}) SELECT {columns} FROM {_quote(staging)} ON CONFLICT DO NOTHING"
+    )
+    return result.rowcount
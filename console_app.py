@@ -11,7 +11,7 @@ from datetime import datetime
 import matplotlib.pyplot as plt
 import pandas as pd
 from dotenv import load_dotenv
-from sqlalchemy import create_engine, text
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.engine import Engine
 from tabulate import tabulate
 
@@ -34,34 +34,74 @@ def get_engine() -> Engine:
 
 
 def get_tickers(conn) -> list[str]:
-    query = text("SELECT DISTINCT ticker FROM stocks_data ORDER BY ticker")
+    # The lookup table only exists once main.py, the backfill or the migrator has run.
+    if inspect(conn).has_table("ticker_last_dates"):
+        query = text("SELECT ticker FROM ticker_last_dates ORDER BY ticker")
+    else:
+        query = text("SELECT DISTINCT ticker FROM stocks_data ORDER BY ticker")
     return [row[0] for row in conn.execute(query).fetchall()]
 
 
 def load_data(conn, ticker, start_date, end_date):
     query = text(
         """
-        SELECT "Date", "Open", "High", "Low", "Close", "Volume", return_pct, ma7, volatility
+        SELECT date, open, high, low, close, volume, return_pct, ma7, volatility
         FROM stocks_data
-        WHERE ticker = :ticker AND "Date" BETWEEN :start AND :end
-        ORDER BY "Date"
+        WHERE ticker = :ticker AND date BETWEEN :start AND :end
+        ORDER BY date
         """
     )
-    df = pd.read_sql(query, conn, params={"ticker": ticker, "start": start_date, "end": end_date})
-    df["Date"] = pd.to_datetime(df["Date"])
+    # Arrow-backed columns are built straight from the result set without an
+    # intermediate object-dtype pass.
+    df = pd.read_sql(
+        query,
+        conn,
+        params={"ticker": ticker, "start": start_date, "end": end_date},
+        dtype_backend="pyarrow",
+    )
+    df["date"] = pd.to_datetime(df["date"], format="ISO8601", cache=True)
     return df
 
 
-def show_summary(df):
-    avg_return = df["return_pct"].mean()
-    avg_volatility = df["volatility"].mean()
-    total_change = (df["Close"].iloc[-1] - df["Close"].iloc[0]) / df["Close"].iloc[0] * 100
+def load_summary(conn, ticker, start_date, end_date) -> dict[str, float] | None:
+    """Aggregate the summary statistics in the database instead of loading every row."""
+    query = text(
+        """
+        SELECT
+            COUNT(*) AS row_count,
+            AVG(return_pct) AS avg_return,
+            AVG(volatility) AS avg_volatility,
+            (
+                SELECT close FROM stocks_data
+                WHERE ticker = :ticker AND date BETWEEN :start AND :end
+                ORDER BY date ASC LIMIT 1
+            ) AS first_close,
+            (
+                SELECT close FROM stocks_data
+                WHERE ticker = :ticker AND date BETWEEN :start AND :end
+                ORDER BY date DESC LIMIT 1
+            ) AS last_close
+        FROM stocks_data
+        WHERE ticker = :ticker AND date BETWEEN :start AND :end
+        """
+    )
+    row = conn.execute(query, {"ticker": ticker, "start": start_date, "end": end_date}).mappings().one()
+    if not row["row_count"]:
+        return None
+    return {
+        key: float("nan") if row[key] is None else float(row[key])
+        for key in ("avg_return", "avg_volatility", "first_close", "last_close")
+    }
+
+
+def show_summary(summary):
+    total_change = (summary["last_close"] - summary["first_close"]) / summary["first_close"] * 100
     print("\n📊 Summary statistics:")
     print(
         tabulate(
             [
-                ["Average daily return (%)", f"{avg_return:.3f}"],
-                ["Average volatility", f"{avg_volatility:.3f}"],
+                ["Average daily return (%)", f"{summary['avg_return']:.3f}"],
+                ["Average volatility", f"{summary['avg_volatility']:.3f}"],
                 ["Total change over period (%)", f"{total_change:.2f}"],
             ],
             headers=["Metric", "Value"],
@@ -72,8 +112,8 @@ def show_summary(df):
 
 def plot_data(df, ticker):
     plt.figure(figsize=(10, 5))
-    plt.plot(df["Date"], df["Close"], label="Close", linewidth=2)
-    plt.plot(df["Date"], df["ma7"], label="MA(7)", linestyle="--")
+    plt.plot(df["date"], df["close"], label="Close", linewidth=2)
+    plt.plot(df["date"], df["ma7"], label="MA(7)", linestyle="--")
     plt.title(f"{ticker} — Price over Time")
     plt.xlabel("Date")
     plt.ylabel("Price ($)")
@@ -106,16 +146,16 @@ def main():
             print("❌ Invalid date format.")
             return
 
-        df = load_data(conn, ticker, start_date, end_date)
-        if df.empty:
+        summary = load_summary(conn, ticker, start_date, end_date)
+        if summary is None:
             print("⚠️ No data for this period.")
             return
 
-        show_summary(df)
+        show_summary(summary)
 
         show_plot = input("\nShow price chart? (y/n): ").lower()
         if show_plot == "y":
-            plot_data(df, ticker)
+            plot_data(load_data(conn, ticker, start_date, end_date), ticker)
 
     print("\n✅ Done.")
 
@@ -0,0 +1,94 @@
+"""Derived metric calculations shared by the loaders."""
+
+from __future__ import annotations
+
+import numpy as np
+import pandas as pd
+
+ROLLING_WINDOW = 7
+
+
+def daily_return_pct(open_: np.ndarray | pd.Series, close: np.ndarray | pd.Series) -> np.ndarray:
+    """Return the open-to-close change in percent, computed in place on NumPy arrays."""
+    opens = np.asarray(open_, dtype=np.float64)
+    result = np.subtract(np.asarray(close, dtype=np.float64), opens)
+    # A zero open yields inf/NaN, as the pandas expression did, without a RuntimeWarning.
+    with np.errstate(invalid="ignore", divide="ignore"):
+        result /= opens
+    result *= 100.0
+    return result
+
+
+def _trailing_sums(values: np.ndarray, window: int) -> np.ndarray:
+    """Sum each row's trailing window (partial at the start) with ``window - 1`` shifted adds."""
+    sums = values.copy()
+    for lag in range(1, min(window, values.size)):
+        sums[lag:] += values[:-lag]
+    return sums
+
+
+def rolling_mean_std(
+    values: np.ndarray,
+    window: int = ROLLING_WINDOW,
+    mean_min_periods: int = 1,
+    std_min_periods: int = 2,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Return the trailing rolling mean and sample std of ``values`` in one pass.
+
+    The window sums are built once and shared by both outputs. Squared
+    deviations are taken from each window's own mean (the two-pass formula),
+    which stays accurate when the spread is small relative to the price level.
+    Series containing NaN fall back to pandas.
+    """
+    values = np.asarray(values, dtype=np.float64)
+    if np.isnan(values).any():
+        rolling = pd.Series(values).rolling(window, min_periods=1)
+        counts = rolling.count().to_numpy()
+        means = rolling.mean().to_numpy(copy=True)
+        stds = rolling.std().to_numpy(copy=True)
+    else:
+        counts = np.minimum(np.arange(1, values.size + 1), window)
+        means = _trailing_sums(values, window) / counts
+        squares = (values - means) ** 2
+        for lag in range(1, min(window, values.size)):
+            squares[lag:] += (values[:-lag] - means[lag:]) ** 2
+        with np.errstate(invalid="ignore", divide="ignore"):
+            stds = np.sqrt(squares / (counts - 1))
+
+    means[counts < max(mean_min_periods, 1)] = np.nan
+    stds[counts < max(std_min_periods, 2)] = np.nan
+    return means, stds
+
+
+def derived_metrics(
+    opens: np.ndarray, closes: np.ndarray, window: int = ROLLING_WINDOW
+) -> tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """Return ``(return_pct, ma7, volatility)`` arrays for one ticker's sorted prices.
+
+    Each input is converted to float64 once and all three outputs are produced
+    from those arrays, without intermediate pandas Series.
+    """
+    opens = np.asarray(opens, dtype=np.float64)
+    closes = np.asarray(closes, dtype=np.float64)
+    ma7, volatility = rolling_mean_std(closes, window)
+    return daily_return_pct(opens, closes), ma7, volatility
+
+
+def with_derived_columns(df: pd.DataFrame, ticker: str) -> pd.DataFrame:
+    """Return ``df`` with ticker, return_pct, ma7 and volatility columns appended.
+
+    ``df`` must hold a single ticker's rows sorted by date. The derived columns are
+    built as one frame and attached with a single concat so pandas does not
+    fragment the block manager with repeated column inserts.
+    """
+    return_pct, ma7, volatility = derived_metrics(df["open"].to_numpy(), df["close"].to_numpy())
+    extras = pd.DataFrame(
+        {
+            "ticker": ticker,
+            "return_pct": return_pct,
+            "ma7": ma7,
+            "volatility": volatility,
+        },
+        index=df.index,
+    )
+    return pd.concat([df, extras], axis=1)
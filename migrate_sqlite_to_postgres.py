@@ -2,14 +2,23 @@
 from __future__ import annotations
 
 import argparse
+import itertools
 import os
 from pathlib import Path
+from typing import Iterable
 
 import pandas as pd
 from dotenv import load_dotenv
-from sqlalchemy import create_engine
+from sqlalchemy import create_engine, inspect, text
 from sqlalchemy.engine import Engine
 
+from bulk_load import copy_dataframe, copy_dataframe_ignore_duplicates, psql_insert_copy
+from features import ROLLING_WINDOW
+from schema import STOCKS_DATA_COLUMNS, ensure_schema, refresh_ticker_last_dates
+
+# Rows per ticker carried into the next chunk: enough for a full rolling window.
+TAIL_ROWS = ROLLING_WINDOW - 1
+
 
 def parse_args() -> argparse.Namespace:
     parser = argparse.ArgumentParser(
@@ -34,8 +43,14 @@ def parse_args() -> argparse.Namespace:
     parser.add_argument(
         "--chunksize",
         type=int,
-        default=1000,
-        help="Number of rows per batch when writing to PostgreSQL (default: 1000).",
+        default=10_000,
+        help="Number of rows per COPY batch when writing tables other than stocks_data (default: 10000).",
+    )
+    parser.add_argument(
+        "--read-chunksize",
+        type=int,
+        default=100_000,
+        help="Number of rows read from SQLite and processed at a time (default: 100000).",
     )
     return parser.parse_args()
 
@@ -62,70 +77,155 @@ def create_postgres_engine(database_url: str) -> Engine:
     return create_engine(database_url, future=True)
 
 
-def main() -> None:
-    args = parse_args()
-    database_url = require_database_url()
-    sqlite_url = build_sqlite_url(args.sqlite_path)
+def write_stocks_data(engine: Engine, frames: Iterable[pd.DataFrame], if_exists: str) -> int:
+    """Load ``frames`` into stocks_data, keeping its primary key; return the row count."""
+    ensure_schema(engine)
+    written = 0
+
+    with engine.begin() as conn:
+        if if_exists == "fail" and conn.execute(text("SELECT 1 FROM stocks_data LIMIT 1")).first():
+            raise RuntimeError("Destination table 'stocks_data' already contains data (--if-exists fail).")
+        if if_exists == "replace":
+            conn.execute(text("TRUNCATE stocks_data"))
+
+        for df in frames:
+            df = df[[col for col in STOCKS_DATA_COLUMNS if col in df.columns]]
+            if if_exists == "append":
+                copy_dataframe_ignore_duplicates(df, "stocks_data", conn)
+            else:
+                copy_dataframe(df, "stocks_data", conn)
+            written += len(df.index)
+        refresh_ticker_last_dates(conn)
+
+    return written
+
+
+def write_table(engine: Engine, frames: Iterable[pd.DataFrame], table: str, if_exists: str, chunksize: int) -> int:
+    """Load ``frames`` into an arbitrary table; ``if_exists`` applies to the first frame only."""
+    written = 0
+    for df in frames:
+        df.to_sql(
+            table,
+            con=engine,
+            if_exists=if_exists if written == 0 else "append",
+            index=False,
+            method=psql_insert_copy,
+            chunksize=chunksize,
+        )
+        written += len(df.index)
+    return written
 
-    sqlite_engine = create_engine(sqlite_url, future=True)
-    postgres_engine = create_postgres_engine(database_url)
 
-    print(f"Reading {args.table!r} from {sqlite_url}...")
-    df = pd.read_sql_table(args.table, con=sqlite_engine)
-    if df.empty:
-        raise RuntimeError(
-            "The source table is empty; nothing to migrate. "
-            "Verify the SQLite database contains data."
-        )
+def build_source_query(table: str, columns: Iterable[str]) -> str:
+    """Return a SELECT over ``table`` ordered by (upper-cased ticker, date)."""
+    query = f'SELECT * FROM "{table}"'
+    names = {col.strip().lower(): col for col in columns}
+    if "ticker" in names and "date" in names:
+        query += f' ORDER BY UPPER("{names["ticker"]}"), "{names["date"]}"'
+    return query
 
+
+def upper_tickers(tickers: pd.Series) -> pd.Series:
+    """Upper-case ticker symbols through a categorical so each distinct symbol is converted once."""
+    tickers = tickers.astype("category")
+    categories = tickers.cat.categories.astype(str)
+    upper = categories.str.upper()
+    if upper.is_unique:
+        return tickers.cat.rename_categories(upper)
+    # Symbols that only differ by case ("aapl" and "AAPL") collapse into one category.
+    return tickers.map(dict(zip(tickers.cat.categories, upper))).astype("category")
+
+
+def prepare_chunk(df: pd.DataFrame, tails: dict[str, pd.DataFrame]) -> pd.DataFrame:
+    """Normalise one chunk, continuing rolling windows from the per-ticker ``tails`` of earlier chunks."""
     # Normalise column names and types
-    df.columns = [str(col).strip().replace(" ", "_") for col in df.columns]
+    df.columns = [str(col).strip().lower().replace(" ", "_") for col in df.columns]
     if "date" in df.columns:
         df["date"] = pd.to_datetime(df["date"])
     if "ticker" in df.columns:
-        df["ticker"] = df["ticker"].astype(str).str.upper()
-
+        df["ticker"] = upper_tickers(df["ticker"])
+
+    carried = "_carried"
+    has_tails = bool(tails) and "ticker" in df.columns
+    df[carried] = False
+    if has_tails:
+        chunk_tickers = set(df["ticker"])
+        previous = [tail for ticker, tail in tails.items() if ticker in chunk_tickers]
+        if previous:
+            df = pd.concat([*previous, df], ignore_index=True)
+
+    # A stable sort keeps carried rows ahead of this chunk's duplicates.
     subset_cols = [col for col in ("ticker", "date") if col in df.columns]
     if subset_cols:
-        df = df.drop_duplicates(subset=subset_cols + ["close"] if "close" in df.columns else subset_cols)
+        df = df.sort_values(subset_cols, kind="stable")
+        df = df.loc[~df.duplicated(subset=subset_cols)].reset_index(drop=True)
 
     if "return_pct" not in df.columns and {"close", "open"}.issubset(df.columns):
         df["return_pct"] = (df["close"] - df["open"]) / df["open"] * 100
-    grouped_close = None
+    # min_periods=1 matches features.rolling_mean_std used by the backfill and daily update.
+    rolling_close = None
+    grouped = False
     if "close" in df.columns:
         if {"ticker", "date"}.issubset(df.columns):
-            df = df.sort_values(["ticker", "date"]).reset_index(drop=True)
-            grouped_close = df.groupby("ticker")["close"]
+            rolling_close = df.groupby("ticker", sort=False)["close"].rolling(ROLLING_WINDOW, min_periods=1)
+            grouped = True
         else:
-            grouped_close = df["close"]
+            rolling_close = df["close"].rolling(ROLLING_WINDOW, min_periods=1)
 
-    if "ma7" not in df.columns and grouped_close is not None:
-        if hasattr(grouped_close, "transform"):
-            df["ma7"] = grouped_close.transform(lambda s: s.rolling(7).mean())
-        else:
-            df["ma7"] = grouped_close.rolling(7).mean()
+    if "ma7" not in df.columns and rolling_close is not None:
+        ma7 = rolling_close.mean()
+        df["ma7"] = ma7.droplevel(0) if grouped else ma7
 
-    if "volatility" not in df.columns and grouped_close is not None:
-        if hasattr(grouped_close, "transform"):
-            df["volatility"] = grouped_close.transform(lambda s: s.rolling(7).std())
-        else:
-            df["volatility"] = grouped_close.rolling(7).std()
+    if "volatility" not in df.columns and rolling_close is not None:
+        volatility = rolling_close.std()
+        df["volatility"] = volatility.droplevel(0) if grouped else volatility
 
-    print(
-        "Writing {rows} rows to PostgreSQL table {table!r} (if_exists={mode})...".format(
-            rows=len(df), table=args.table, mode=args.if_exists
-        )
-    )
-    df.to_sql(
-        args.table,
-        con=postgres_engine,
-        if_exists=args.if_exists,
-        index=False,
-        method="multi",
-        chunksize=args.chunksize,
+    if {"ticker", "date"}.issubset(df.columns):
+        tail_cols = [col for col in ("ticker", "date", "open", "close") if col in df.columns]
+        for ticker, rows in df.groupby("ticker", sort=False):
+            tails[ticker] = rows[tail_cols].tail(TAIL_ROWS).assign(**{carried: True})
+
+    return df[~df[carried]].drop(columns=[carried])
+
+
+def main() -> None:
+    args = parse_args()
+    database_url = require_database_url()
+    sqlite_url = build_sqlite_url(args.sqlite_path)
+
+    sqlite_engine = create_engine(sqlite_url, future=True)
+    postgres_engine = create_postgres_engine(database_url)
+
+    source_columns = {column["name"] for column in inspect(sqlite_engine).get_columns(args.table)}
+    if not source_columns:
+        raise RuntimeError(f"Table {args.table!r} not found in {sqlite_url}.")
+    query = build_source_query(args.table, source_columns)
+
+    print(f"Reading {args.table!r} from {sqlite_url} in chunks of {args.read_chunksize} rows...")
+    # Arrow-backed columns keep numbers in native buffers and strings out of Python objects.
+    chunks = pd.read_sql_query(
+        query,
+        con=sqlite_engine,
+        chunksize=args.read_chunksize,
+        dtype_backend="pyarrow",
     )
+    first = next(chunks, None)
+    if first is None or first.empty:
+        raise RuntimeError(
+            "The source table is empty; nothing to migrate. "
+            "Verify the SQLite database contains data."
+        )
+
+    tails: dict[str, pd.DataFrame] = {}
+    frames = (prepare_chunk(chunk, tails) for chunk in itertools.chain([first], chunks))
+
+    print(f"Writing to PostgreSQL table {args.table!r} (if_exists={args.if_exists})...")
+    if args.table == "stocks_data":
+        written = write_stocks_data(postgres_engine, frames, args.if_exists)
+    else:
+        written = write_table(postgres_engine, frames, args.table, args.if_exists, args.chunksize)
 
-    print("Migration completed successfully.")
+    print(f"Migration completed successfully: wrote {written} rows.")
 
 
 if __name__ == "__main__":
@@ -0,0 +1,11 @@
+CREATE TABLE IF NOT EXISTS ticker_last_dates (
+    ticker TEXT PRIMARY KEY,
+    last_date DATE NOT NULL
+);
+
+-- Seed the lookup table from existing price history the first time it is created.
+INSERT INTO ticker_last_dates (ticker, last_date)
+SELECT ticker, MAX(date)
+FROM stocks_data
+WHERE NOT EXISTS (SELECT 1 FROM ticker_last_dates)
+GROUP BY ticker;
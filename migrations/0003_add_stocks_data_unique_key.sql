@@ -0,0 +1,3 @@
+-- ON CONFLICT DO NOTHING needs a unique key on (ticker, date). Tables created by
+-- older migrator runs with --if-exists replace have none, so add it here.
+CREATE UNIQUE INDEX IF NOT EXISTS ux_stocks_ticker_date ON stocks_data (ticker, date);
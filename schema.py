@@ -2,29 +2,85 @@
 
 from __future__ import annotations
 
+from functools import lru_cache
 from pathlib import Path
 from typing import Iterable
 
-from sqlalchemy.engine import Engine
+from sqlalchemy import bindparam, text
+from sqlalchemy.engine import Connection, Engine
 
-_SCHEMA_PATH = Path(__file__).resolve().parent / "migrations" / "0001_create_stocks_data.sql"
+_MIGRATIONS_DIR = Path(__file__).resolve().parent / "migrations"
 
+# Columns taken from a price download; the remaining stocks_data columns are derived.
+SOURCE_COLUMNS = ("date", "open", "high", "low", "close", "volume")
+STOCKS_DATA_COLUMNS = (*SOURCE_COLUMNS, "ticker", "return_pct", "ma7", "volatility")
 
-def _load_schema_statements() -> Iterable[str]:
-    """Return the non-empty SQL statements defined in the schema file."""
-    raw_sql = _SCHEMA_PATH.read_text(encoding="utf-8")
-    for statement in raw_sql.split(";"):
-        stmt = statement.strip()
-        if stmt:
-            yield stmt
+# Indexes on stocks_data created by the migrations in addition to the primary key.
+SECONDARY_INDEXES = ("idx_stocks_data_ticker",)
 
 
-def ensure_schema(engine: Engine) -> None:
-    """Apply the schema DDL to the provided engine."""
-    statements = list(_load_schema_statements())
+@lru_cache(maxsize=1)
+def _load_schema_script() -> str:
+    """Return the concatenated SQL of all migration files, in order (read once per process)."""
+    # Join with ";" so a file whose last statement lacks a terminator cannot run into the next one.
+    return ";\n".join(path.read_text(encoding="utf-8") for path in sorted(_MIGRATIONS_DIR.glob("*.sql")))
+
+
+@lru_cache(maxsize=1)
+def _load_schema_statements() -> tuple[str, ...]:
+    """Return the non-empty SQL statements defined in the migration files, in order."""
+    return tuple(stmt for stmt in (part.strip() for part in _load_schema_script().split(";")) if stmt)
+
+
+def apply_schema(conn: Connection) -> None:
+    """Apply the schema DDL on an open connection, inside the caller's transaction."""
+    statements = _load_schema_statements()
     if not statements:
-        raise RuntimeError(f"No DDL statements found in {_SCHEMA_PATH}")
+        raise RuntimeError(f"No DDL statements found in {_MIGRATIONS_DIR}")
+
+    if conn.dialect.name == "postgresql":
+        # psycopg2 accepts a multi-statement script, so send it in one round trip.
+        conn.exec_driver_sql(_load_schema_script())
+        return
+
+    for stmt in statements:
+        conn.exec_driver_sql(stmt)
+
 
+def ensure_schema(engine: Engine) -> None:
+    """Apply the schema DDL to the provided engine."""
     with engine.begin() as conn:
-        for stmt in statements:
-            conn.exec_driver_sql(stmt)
+        apply_schema(conn)
+
+
+def drop_secondary_indexes(conn: Connection) -> None:
+    """Drop the non-key indexes on stocks_data; ``apply_schema`` recreates them."""
+    for index_name in SECONDARY_INDEXES:
+        conn.exec_driver_sql(f"DROP INDEX IF EXISTS {index_name}")
+
+
+def refresh_ticker_last_dates(conn: Connection, tickers: Iterable[str] | None = None) -> None:
+    """Recompute the ticker_last_dates lookup from stocks_data.
+
+    Only the given tickers are refreshed; with ``tickers=None`` the whole lookup
+    table is rebuilt.
+    """
+    if tickers is None:
+        conn.execute(text("DELETE FROM ticker_last_dates"))
+        conn.execute(
+            text(
+                "INSERT INTO ticker_last_dates (ticker, last_date) "
+                "SELECT ticker, MAX(date) FROM stocks_data GROUP BY ticker"
+            )
+        )
+        return
+
+    tickers = list(tickers)
+    if not tickers:
+        return
+    query = text(
+        "INSERT INTO ticker_last_dates (ticker, last_date) "
+        "SELECT ticker, MAX(date) FROM stocks_data WHERE ticker IN :tickers GROUP BY ticker "
+        "ON CONFLICT (ticker) DO UPDATE SET last_date = excluded.last_date"
+    ).bindparams(bindparam("tickers", expanding=True))
+    conn.execute(query, {"tickers": tickers})
@@ -13,8 +13,14 @@ if not DATABASE_URL:
     pytest.skip("DATABASE_URL environment variable not provided", allow_module_level=True)
 
 
-def test_database_connection_round_trip():
+@pytest.fixture(scope="module")
+def engine():
     engine = create_engine(DATABASE_URL, future=True)
+    yield engine
+    engine.dispose()
+
+
+def test_database_connection_round_trip(engine):
     with engine.connect() as conn:
         result = conn.execute(text("SELECT 1")).scalar()
 
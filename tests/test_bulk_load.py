@@ -0,0 +1,66 @@
+from pathlib import Path
+import sys
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import create_engine, text
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from bulk_load import copy_dataframe_ignore_duplicates, dataframe_to_csv_buffer, tune_sqlite_engine
+from schema import ensure_schema
+
+
+def test_tune_sqlite_engine_sets_write_pragmas(tmp_path):
+    engine = tune_sqlite_engine(create_engine(f"sqlite:///{tmp_path / 'stocks.db'}", future=True))
+
+    with engine.connect() as conn:
+        journal_mode = conn.exec_driver_sql("PRAGMA journal_mode").scalar()
+        synchronous = conn.exec_driver_sql("PRAGMA synchronous").scalar()
+        temp_store = conn.exec_driver_sql("PRAGMA temp_store").scalar()
+
+    assert journal_mode == "wal"
+    assert synchronous == 1  # NORMAL
+    assert temp_store == 2  # MEMORY
+
+
+def test_dataframe_to_csv_buffer_writes_copy_ready_rows():
+    df = pd.DataFrame(
+        {
+            "date": pd.to_datetime(["2024-01-01", "2024-01-02"]),
+            "ticker": ["AAPL", "AAPL"],
+            "close": np.array([10.5, np.nan], dtype=np.float32),
+            "volume": [1000, 1500],
+        }
+    )
+
+    lines = dataframe_to_csv_buffer(df).read().decode().splitlines()
+
+    assert len(lines) == 2
+    assert lines[0].startswith("2024-01-01")
+    assert lines[0].endswith(',"AAPL",10.5,1000')
+    # NaN becomes an empty field, which COPY ... WITH CSV reads as NULL.
+    assert lines[1].endswith(',"AAPL",,1500')
+
+
+def test_dataframe_to_csv_buffer_writes_float_volume_as_integers():
+    df = pd.DataFrame({"ticker": ["AAPL", "AAPL"], "volume": [12_345_678_901.0, np.nan]})
+
+    lines = dataframe_to_csv_buffer(df).read().decode().splitlines()
+
+    assert lines == ['"AAPL",12345678901', '"AAPL",']
+
+
+def test_copy_dataframe_ignore_duplicates_skips_existing_keys():
+    engine = create_engine("sqlite+pysqlite:///:memory:", future=True)
+    ensure_schema(engine)
+    df = pd.DataFrame({"date": pd.to_datetime(["2024-01-01", "2024-01-02"]), "ticker": "AAPL", "close": [1.0, 2.0]})
+
+    with engine.begin() as conn:
+        copy_dataframe_ignore_duplicates(df.iloc[:1].assign(close=9.0), "stocks_data", conn)
+        copy_dataframe_ignore_duplicates(df, "stocks_data", conn)
+        rows = conn.execute(text("SELECT close FROM stocks_data ORDER BY date")).scalars().all()
+
+    assert rows == [9.0, 2.0]
@@ -0,0 +1,60 @@
+from pathlib import Path
+import sys
+import warnings
+
+import numpy as np
+import pandas as pd
+import pytest
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from features import daily_return_pct, rolling_mean_std
+
+
+def sample_closes(with_gaps=False):
+    rng = np.random.default_rng(7)
+    closes = 500 + rng.normal(0, 0.5, size=60).cumsum()
+    if with_gaps:
+        closes[[3, 20, 21]] = np.nan
+    return closes
+
+
+@pytest.mark.parametrize("min_periods", [1, 3, 7])
+@pytest.mark.parametrize("with_gaps", [False, True])
+def test_rolling_mean_std_means_match_pandas(min_periods, with_gaps):
+    closes = sample_closes(with_gaps)
+
+    expected = pd.Series(closes).rolling(7, min_periods=min_periods).mean().to_numpy()
+    means, _ = rolling_mean_std(closes, 7, mean_min_periods=min_periods)
+
+    np.testing.assert_allclose(means, expected, equal_nan=True)
+
+
+@pytest.mark.parametrize("min_periods", [2, 5, 7])
+@pytest.mark.parametrize("with_gaps", [False, True])
+def test_rolling_mean_std_stds_match_pandas(min_periods, with_gaps):
+    closes = sample_closes(with_gaps)
+
+    expected = pd.Series(closes).rolling(7, min_periods=min_periods).std().to_numpy()
+    _, stds = rolling_mean_std(closes, 7, std_min_periods=min_periods)
+
+    np.testing.assert_allclose(stds, expected, rtol=1e-9, equal_nan=True)
+
+
+def test_rolling_mean_std_handles_series_shorter_than_window():
+    closes = np.array([10.5, 12.0])
+
+    means, stds = rolling_mean_std(closes)
+
+    np.testing.assert_allclose(means, [10.5, 11.25])
+    np.testing.assert_allclose(stds, [np.nan, np.std(closes, ddof=1)], equal_nan=True)
+
+
+def test_daily_return_pct_handles_zero_open_silently():
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        result = daily_return_pct(np.array([0.0, 0.0, 10.0]), np.array([1.0, 0.0, 11.0]))
+
+    np.testing.assert_allclose(result, [np.inf, np.nan, 10.0], equal_nan=True)
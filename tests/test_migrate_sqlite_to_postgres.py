@@ -0,0 +1,94 @@
+from pathlib import Path
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+from sqlalchemy import create_engine
+
+PROJECT_ROOT = Path(__file__).resolve().parents[1]
+if str(PROJECT_ROOT) not in sys.path:
+    sys.path.insert(0, str(PROJECT_ROOT))
+
+from features import derived_metrics
+from migrate_sqlite_to_postgres import build_source_query, prepare_chunk, upper_tickers
+
+
+def build_legacy_engine():
+    rng = np.random.default_rng(0)
+    rows = []
+    for ticker in ["aapl", "msft", "tsla"]:
+        for day in pd.date_range("2024-01-01", periods=20):
+            open_ = rng.uniform(90, 110)
+            rows.append({"Date": day, "Ticker": ticker, "Open": open_, "Close": open_ + rng.normal()})
+    legacy = pd.DataFrame(rows)
+    # Repeat a few rows, some with upper-cased tickers, so duplicates straddle chunk
+    # boundaries and "AAPL" would sort apart from "aapl" by raw ticker.
+    repeated = legacy.iloc[[10, 19, 30]]
+    upper_repeated = legacy.iloc[[*range(10), 25, 59]].assign(
+        Ticker=lambda d: d["Ticker"].str.upper(), Close=-1.0
+    )
+    legacy = pd.concat([legacy, repeated, upper_repeated], ignore_index=True)
+
+    engine = create_engine("sqlite+pysqlite:///:memory:", future=True)
+    legacy.to_sql("stocks_data", engine, index=False)
+    return engine
+
+
+@pytest.mark.parametrize("chunksize", [1, 4, 7, 25])
+def test_prepare_chunk_matches_single_pass(chunksize):
+    engine = build_legacy_engine()
+    query = build_source_query("stocks_data", ["Date", "Ticker", "Open", "Close"])
+
+    expected = prepare_chunk(pd.read_sql_query(query, engine, dtype_backend="pyarrow"), {})
+
+    tails = {}
+    chunks = pd.read_sql_query(query, engine, chunksize=chunksize, dtype_backend="pyarrow")
+    streamed = pd.concat([prepare_chunk(chunk, tails) for chunk in chunks], ignore_index=True)
+
+    assert len(expected) == 60
+    assert expected["ticker"].unique().tolist() == ["AAPL", "MSFT", "TSLA"]
+    assert not streamed.duplicated(subset=["ticker", "date"]).any()
+    # Each chunk carries its own ticker categories, so compare the symbols as strings.
+    pd.testing.assert_frame_equal(
+        streamed.astype({"ticker": str}),
+        expected.reset_index(drop=True).astype({"ticker": str}),
+    )
+
+
+def test_upper_tickers_merges_symbols_that_differ_only_by_case():
+    tickers = pd.Series(["aapl", "MSFT", "AAPL", "aapl"])
+
+    result = upper_tickers(tickers)
+
+    assert result.tolist() == ["AAPL", "MSFT", "AAPL", "AAPL"]
+    assert sorted(result.cat.categories) == ["AAPL", "MSFT"]
+
+
+def test_prepare_chunk_keeps_one_row_per_ticker_and_date():
+    chunk = pd.DataFrame(
+        {
+            "Date": ["2024-01-02", "2024-01-01", "2024-01-01"],
+            "Ticker": ["aapl", "aapl", "aapl"],
+            "Open": [10.0, 9.0, 9.5],
+            "Close": [11.0, 10.0, 10.5],
+        }
+    )
+
+    result = prepare_chunk(chunk, {})
+
+    assert result["date"].tolist() == [pd.Timestamp("2024-01-01"), pd.Timestamp("2024-01-02")]
+    assert result["close"].tolist() == [10.0, 11.0]
+
+
+def test_prepare_chunk_metrics_match_backfill_features():
+    engine = build_legacy_engine()
+    query = build_source_query("stocks_data", ["Date", "Ticker", "Open", "Close"])
+    migrated = prepare_chunk(pd.read_sql_query(query, engine), {})
+    aapl = migrated[migrated["ticker"] == "AAPL"]
+
+    return_pct, ma7, volatility = derived_metrics(aapl["open"].to_numpy(), aapl["close"].to_numpy())
+
+    np.testing.assert_allclose(aapl["return_pct"], return_pct)
+    np.testing.assert_allclose(aapl["ma7"], ma7)
+    np.testing.assert_allclose(aapl["volatility"], volatility, equal_nan=True)
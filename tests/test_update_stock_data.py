@@ -1,3 +1,4 @@
+from datetime import datetime
 from pathlib import Path
 import sys
 
@@ -10,7 +11,8 @@ PROJECT_ROOT = Path(__file__).resolve().parents[1]
 if str(PROJECT_ROOT) not in sys.path:
     sys.path.insert(0, str(PROJECT_ROOT))
 
-from main import update_stock_data
+import main
+from main import get_last_dates, run_daily_updates, seconds_until_next_run, update_stock_data
 from schema import ensure_schema
 
 
@@ -36,10 +38,24 @@ def build_engine():
     )
 
 
-def test_update_stock_data_is_idempotent():
+@pytest.fixture(scope="module")
+def schema_engine():
     engine = build_engine()
     ensure_schema(engine)
+    yield engine
+    engine.dispose()
 
+
+@pytest.fixture
+def engine(schema_engine):
+    # The schema is created once per module; each test starts from empty tables.
+    yield schema_engine
+    with schema_engine.begin() as conn:
+        conn.execute(text("DELETE FROM stocks_data"))
+        conn.execute(text("DELETE FROM ticker_last_dates"))
+
+
+def test_update_stock_data_is_idempotent(engine):
     # First run populates the database
     update_stock_data(engine=engine, tickers=["AAPL"], fetcher=fake_fetcher)
 
@@ -66,3 +82,135 @@ def test_update_stock_data_is_idempotent():
     assert latest[1] == pytest.approx((12.0 - 11.0) / 11.0 * 100)
     assert latest[2] == pytest.approx((10.5 + 12.0) / 2)
     assert latest[3] is None or latest[3] >= 0
+
+
+def test_get_last_dates_returns_latest_date_per_ticker(engine):
+    update_stock_data(engine=engine, tickers=["AAPL", "MSFT"], fetcher=fake_fetcher)
+
+    with engine.connect() as conn:
+        last_dates = get_last_dates(conn, ["AAPL", "MSFT", "TSLA"])
+
+    assert last_dates == {
+        "AAPL": datetime(2024, 1, 2),
+        "MSFT": datetime(2024, 1, 2),
+    }
+
+
+def test_update_stock_data_skips_rows_already_stored(engine):
+    def first_day_fetcher(ticker, start, end):
+        return fake_fetcher(ticker, start, end).iloc[:1].assign(Close=99.0)
+
+    update_stock_data(engine=engine, tickers=["AAPL"], fetcher=first_day_fetcher)
+
+    # The fetcher returns an overlapping range; the stored row must be kept as-is.
+    update_stock_data(engine=engine, tickers=["AAPL"], fetcher=fake_fetcher)
+
+    with engine.connect() as conn:
+        rows = conn.execute(
+            text("SELECT date, close FROM stocks_data WHERE ticker = :ticker ORDER BY date"),
+            {"ticker": "AAPL"},
+        ).fetchall()
+
+    assert [row[1] for row in rows] == [99.0, 12.0]
+
+
+def test_update_stock_data_stores_other_tickers_when_one_fetch_fails(engine):
+    def flaky_fetcher(ticker, start, end):
+        if ticker == "BAD":
+            raise ValueError("no such symbol")
+        return fake_fetcher(ticker, start, end)
+
+    update_stock_data(engine=engine, tickers=["AAPL", "BAD", "MSFT"], fetcher=flaky_fetcher)
+
+    with engine.connect() as conn:
+        tickers = conn.execute(text("SELECT DISTINCT ticker FROM stocks_data ORDER BY ticker")).scalars().all()
+
+    assert tickers == ["AAPL", "MSFT"]
+
+
+def test_ensure_schema_seeds_ticker_last_dates_from_existing_rows():
+    engine = build_engine()
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "CREATE TABLE stocks_data (date DATE NOT NULL, ticker TEXT NOT NULL, close DOUBLE PRECISION, "
+            "PRIMARY KEY (ticker, date))"
+        )
+        conn.exec_driver_sql(
+            "INSERT INTO stocks_data (date, ticker, close) VALUES "
+            "('2024-01-01', 'AAPL', 1.0), ('2024-01-05', 'AAPL', 2.0), ('2024-01-03', 'MSFT', 3.0)"
+        )
+
+    ensure_schema(engine)
+
+    with engine.connect() as conn:
+        last_dates = get_last_dates(conn, ["AAPL", "MSFT"])
+
+    assert last_dates == {
+        "AAPL": datetime(2024, 1, 5),
+        "MSFT": datetime(2024, 1, 3),
+    }
+
+
+def test_update_stock_data_dedupes_tables_created_without_a_key():
+    engine = build_engine()
+    with engine.begin() as conn:
+        conn.exec_driver_sql(
+            "CREATE TABLE stocks_data (date DATE, open DOUBLE PRECISION, high DOUBLE PRECISION, "
+            "low DOUBLE PRECISION, close DOUBLE PRECISION, volume BIGINT, ticker TEXT, "
+            "return_pct DOUBLE PRECISION, ma7 DOUBLE PRECISION, volatility DOUBLE PRECISION)"
+        )
+
+    update_stock_data(engine=engine, tickers=["AAPL"], fetcher=fake_fetcher)
+    with engine.begin() as conn:
+        conn.execute(text("DELETE FROM ticker_last_dates"))
+    update_stock_data(engine=engine, tickers=["AAPL"], fetcher=fake_fetcher)
+
+    with engine.connect() as conn:
+        count = conn.execute(text("SELECT COUNT(*) FROM stocks_data")).scalar()
+
+    assert count == 2
+
+
+def test_seconds_until_next_run_rolls_over_to_the_next_day():
+    assert seconds_until_next_run(datetime(2024, 1, 1, 17, 59, 30)) == 30
+    assert seconds_until_next_run(datetime(2024, 1, 1, 18, 0)) == 24 * 60 * 60
+    assert seconds_until_next_run(datetime(2024, 1, 1, 20, 0)) == 22 * 60 * 60
+
+
+def test_run_daily_updates_runs_once_per_day_despite_early_wakeups(monkeypatch):
+    # Pairs of (before sleeping, after waking) wall-clock readings.
+    wall_clock = iter(
+        [
+            datetime(2024, 1, 1, 17, 0), datetime(2024, 1, 1, 17, 59),  # woke early
+            datetime(2024, 1, 1, 17, 59), datetime(2024, 1, 1, 18, 0),  # due: run
+            datetime(2024, 1, 1, 17, 59, 30), datetime(2024, 1, 1, 18, 0, 10),  # clock stepped back: skip
+            datetime(2024, 1, 1, 18, 1), datetime(2024, 1, 2, 18, 0),  # next day: run
+        ]
+    )
+
+    class FakeDatetime(datetime):
+        @classmethod
+        def now(cls, tz=None):
+            return next(wall_clock)
+
+    monotonic = [0.0]
+    runs = []
+
+    def fake_sleep(seconds):
+        monotonic[0] += seconds
+
+    def fake_update():
+        runs.append(monotonic[0])
+        if len(runs) == 2:
+            raise KeyboardInterrupt
+
+    monkeypatch.setattr(main, "datetime", FakeDatetime)
+    monkeypatch.setattr(main.time, "monotonic", lambda: monotonic[0])
+    monkeypatch.setattr(main.time, "sleep", fake_sleep)
+    monkeypatch.setattr(main, "update_stock_data", fake_update)
+
+    with pytest.raises(KeyboardInterrupt):
+        run_daily_updates()
+
+    assert len(runs) == 2
+    assert next(wall_clock, None) is None
@@ -0,0 +1,14 @@
+"""yfinance cache configuration shared by the updater and the backfill."""
+
+from __future__ import annotations
+
+import os
+
+import yfinance as yf
+
+
+def configure_yfinance_cache() -> None:
+    """Point yfinance's timezone/cookie cache at ``YF_CACHE_DIR`` so it survives restarts."""
+    cache_dir = os.getenv("YF_CACHE_DIR")
+    if cache_dir:
+        yf.set_tz_cache_location(cache_dir)